@@ -6,21 +6,41 @@
 и событий, используя обёртку для HTTP запросов из модуля http_client.
 """
 
+import asyncio
+import functools
+import itertools
 import logging
-from typing import TypedDict
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, TypedDict
 
-from .http_client import get_json
+from .http_client import (
+    close_session,
+    get_json,
+    get_json_with_headers,
+    parse_link_header,
+)
 
 
 class GitlabConfig(TypedDict, total=False):
     poll_interval: int | float
     url: str
     token: str
+    concurrency: int
+    activity_window: int | float
+    max_interval: int | float
+    mode: str
+    webhook_secret: str
+    webhook_host: str
+    webhook_port: int
 
 
 class Project(TypedDict, total=False):
     id: int
     name: str
+    path_with_namespace: str
 
 
 class Pipeline(TypedDict):
@@ -52,20 +72,268 @@ class RawEvent(TypedDict, total=False):
     author_username: str
 
 
+@functools.cache
+def auth_headers(token: str) -> dict[str, str]:
+    """
+    Возвращает заголовки авторизации для токена. Словарь создаётся один раз
+    на токен и разделяется между запросами, поэтому изменять его нельзя.
+
+    :param token: Персональный токен для доступа к API GitLab.
+    :return: Словарь HTTP заголовков.
+    """
+    return {'PRIVATE-TOKEN': token}
+
+
+@functools.cache
+def _projects_prefix(base_url: str) -> str:
+    """
+    Возвращает префикс URL ресурсов проектов для базового URL GitLab.
+
+    :param base_url: Базовый URL GitLab.
+    :return: Префикс вида "{base_url}/api/v4/projects/".
+    """
+    return base_url + '/api/v4/projects/'
+
+
+_PAGE_RE = re.compile(r'([?&])page=(\d+)')
+
+
+async def fetch_all_pages(
+    url: str,
+    headers: dict[str, str],
+) -> list[Any] | None:
+    """
+    Загружает все страницы постраничного ответа GitLab API.
+
+    Если первая страница содержит ссылку rel="last", остальные страницы
+    запрашиваются параллельно. Иначе (например, при keyset-пагинации)
+    выполняется последовательный переход по ссылкам rel="next".
+
+    :param url: URL первой страницы.
+    :param headers: HTTP заголовки запроса.
+    :return: Объединённый список элементов всех страниц или None.
+    """
+    result = await get_json_with_headers(url, headers)
+    if result is None:
+        return None
+    first_page, response_headers = result
+    link_header = response_headers.get('Link')
+
+    last_url = parse_link_header(link_header, 'last')
+    match = _PAGE_RE.search(last_url) if last_url else None
+    if last_url and match:
+        last_page = int(match.group(2))
+        pages = await asyncio.gather(
+            *(
+                get_json(
+                    _PAGE_RE.sub(rf'\g<1>page={page}', last_url, count=1),
+                    headers,
+                )
+                for page in range(2, last_page + 1)
+            )
+        )
+        if any(page is None for page in pages):
+            return None
+        return list(itertools.chain.from_iterable([first_page, *pages]))
+
+    items = list(first_page)
+    next_url = parse_link_header(link_header, 'next')
+    while next_url:
+        result = await get_json_with_headers(next_url, headers)
+        if result is None:
+            return None
+        page, response_headers = result
+        items.extend(page)
+        next_url = parse_link_header(response_headers.get('Link'), 'next')
+    return items
+
+
+@dataclass
+class _ProjectsEntry:
+    data: list[Project] | None = None
+    since: datetime | None = None
+    timestamp: float = 0.0
+    task: asyncio.Task[None] | None = None
+
+
+class _ProjectsCache:
+    """
+    Кеш списка проектов по схеме stale-while-revalidate.
+
+    Пока в кеше есть подходящий список, он возвращается сразу; если список
+    старше ttl секунд или запрошен с другой границей активности, обновление
+    запускается в фоне, и ожидать его приходится только следующему вызову.
+    Одновременно для ключа выполняется не больше одного запроса. Ожидание
+    запроса нужно лишь при первом обращении или когда в кеше нет списка,
+    покрывающего запрошенную границу активности.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, str], _ProjectsEntry] = {}
+
+    @staticmethod
+    def _covers(entry: _ProjectsEntry, since: datetime | None) -> bool:
+        """
+        Проверяет, что сохранённый список содержит все проекты для границы.
+
+        Список, полученный с более ранней границей активности (или без неё),
+        является надмножеством списка с более поздней границей.
+
+        :param entry: Запись кеша.
+        :param since: Запрошенная граница активности.
+        :return: True, если список из кеша можно вернуть.
+        """
+        if entry.data is None:
+            return False
+        if entry.since is None:
+            return True
+        return since is not None and entry.since <= since
+
+    def _revalidate(
+        self,
+        entry: _ProjectsEntry,
+        since: datetime | None,
+        fetch: Callable[[datetime | None], Awaitable[list[Project] | None]],
+    ) -> asyncio.Task[None]:
+        """
+        Запускает фоновое обновление записи, если оно ещё не выполняется.
+
+        :param entry: Запись кеша.
+        :param since: Граница активности для запроса.
+        :param fetch: Функция, выполняющая запрос к API.
+        :return: Задача обновления.
+        """
+        if entry.task is not None:
+            return entry.task
+
+        async def refresh() -> None:
+            try:
+                data = await fetch(since)
+            except Exception as e:
+                logging.error(f'Ошибка обновления списка проектов: {e}')
+                data = None
+            finally:
+                entry.task = None
+            if data is not None:
+                entry.data = data
+                entry.since = since
+                entry.timestamp = time.monotonic()
+
+        entry.task = asyncio.create_task(refresh())
+        return entry.task
+
+    async def get(
+        self,
+        key: tuple[str, str],
+        ttl: float,
+        since: datetime | None,
+        fetch: Callable[[datetime | None], Awaitable[list[Project] | None]],
+    ) -> list[Project] | None:
+        """
+        Возвращает список проектов из кеша, при необходимости обновляя его.
+
+        :param key: Ключ кеша (базовый URL и токен).
+        :param ttl: Время, в течение которого список считается свежим.
+        :param since: Граница активности проектов.
+        :param fetch: Функция, выполняющая запрос к API.
+        :return: Список проектов или None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _ProjectsEntry()
+
+        if not self._covers(entry, since):
+            if entry.task is not None:
+                await asyncio.shield(entry.task)
+            if not self._covers(entry, since):
+                await asyncio.shield(self._revalidate(entry, since, fetch))
+            return entry.data if self._covers(entry, since) else None
+
+        if entry.since != since or time.monotonic() - entry.timestamp >= ttl:
+            self._revalidate(entry, since, fetch)
+        return entry.data
+
+    async def cancel(self) -> None:
+        """
+        Отменяет фоновые обновления списка проектов и дожидается их завершения.
+        """
+        tasks = [
+            entry.task
+            for entry in self._entries.values()
+            if entry.task is not None
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_projects_cache = _ProjectsCache()
+
+
+async def shutdown() -> None:
+    """
+    Останавливает фоновую работу модуля: отменяет обновления списка проектов,
+    затем выполняющиеся запросы, и закрывает HTTP сессию. Вызывается при
+    завершении работы вместо http_client.close_session().
+    """
+    await _projects_cache.cancel()
+    await close_session()
+
+
 async def fetch_all_projects(
     base_url: str,
     token: str,
+    ttl: float = 0,
+    since: datetime | None = None,
 ) -> list[Project] | None:
     """
     Получает список проектов, доступных пользователю, через GitLab API.
 
+    Список отдаётся из кеша без ожидания сети и обновляется в фоне, когда
+    становится старше ttl секунд (stale-while-revalidate), поэтому он может
+    отставать от GitLab на один вызов. Ждать запроса приходится только при
+    первом обращении.
+
+    :param base_url: Базовый URL GitLab.
+    :param token: Персональный токен для доступа к API GitLab.
+    :param ttl: Время, в течение которого список считается свежим.
+    :param since: Если задано, возвращаются только проекты с активностью
+        после этого момента.
+    :return: Список проектов в формате JSON или None.
+    """
+    return await _projects_cache.get(
+        (base_url, token),
+        ttl,
+        since,
+        lambda bound: _fetch_all_projects(base_url, token, bound),
+    )
+
+
+async def _fetch_all_projects(
+    base_url: str,
+    token: str,
+    since: datetime | None = None,
+) -> list[Project] | None:
+    """
+    Выполняет запрос списка проектов к GitLab API. Использует keyset-пагинацию,
+    страницы загружаются через fetch_all_pages.
+
     :param base_url: Базовый URL GitLab.
     :param token: Персональный токен для доступа к API GitLab.
+    :param since: Нижняя граница last_activity_at проекта.
     :return: Список проектов в формате JSON или None.
     """
-    url = f'{base_url}/api/v4/projects?membership=true&per_page=100'
-    headers = {'PRIVATE-TOKEN': token}
-    projects = await get_json(url, headers)
+    url = (
+        f'{base_url}/api/v4/projects?membership=true&pagination=keyset'
+        f'&per_page=100&order_by=id&sort=asc'
+    )
+    if since is not None:
+        since_utc = since.astimezone(timezone.utc)
+        url += f'&last_activity_after={since_utc:%Y-%m-%dT%H:%M:%SZ}'
+    projects: list[Project] | None = await fetch_all_pages(
+        url,
+        auth_headers(token),
+    )
     if projects is None:
         logging.error('Не удалось получить список проектов.')
     return projects
@@ -84,9 +352,8 @@ async def fetch_pipeline(
     :param token: Персональный токен для доступа к API GitLab.
     :return: Данные последнего пайплайна или None.
     """
-    url = f'{base_url}/api/v4/projects/{project_id}/pipelines?per_page=1'
-    headers = {'PRIVATE-TOKEN': token}
-    pipelines: list[Pipeline] | None = await get_json(url, headers)
+    url = _projects_prefix(base_url) + str(project_id) + '/pipelines?per_page=1'
+    pipelines: list[Pipeline] | None = await get_json(url, auth_headers(token))
     if pipelines and len(pipelines) > 0:
         return pipelines[0]
     return None
@@ -108,11 +375,12 @@ async def fetch_merge_requests(
     :return: Список merge request в формате JSON или None.
     """
     url = (
-        f'{base_url}/api/v4/projects/{project_id}/merge_requests?'
-        f'state=all&order_by=updated_at&sort=desc&per_page={per_page}'
+        _projects_prefix(base_url)
+        + str(project_id)
+        + '/merge_requests?state=all&order_by=updated_at&sort=desc&per_page='
+        + str(per_page)
     )
-    headers = {'PRIVATE-TOKEN': token}
-    mrs: list[MergeRequest] | None = await get_json(url, headers)
+    mrs: list[MergeRequest] | None = await get_json(url, auth_headers(token))
     if mrs is None:
         logging.error(
             f'Не удалось получить merge requests для проекта {project_id}.'
@@ -135,9 +403,16 @@ async def fetch_project_events(
     :param per_page: Количество событий для выборки.
     :return: Список событий в формате JSON или None.
     """
-    url = f'{base_url}/api/v4/projects/{project_id}/events?per_page={per_page}'
-    headers = {'PRIVATE-TOKEN': token}
-    events_list: list[RawEvent] | None = await get_json(url, headers)
+    url = (
+        _projects_prefix(base_url)
+        + str(project_id)
+        + '/events?per_page='
+        + str(per_page)
+    )
+    events_list: list[RawEvent] | None = await get_json(
+        url,
+        auth_headers(token),
+    )
     if events_list is None:
         logging.error(f'Не удалось получить события для проекта {project_id}.')
     return events_list
@@ -5,17 +5,36 @@
 Содержит функции для периодического опроса событий GitLab (CI/CD пайплайнов,
 push-событий и merge request) с использованием функций из модуля gitlab/api.py.
 
-Каждая функция принимает callback, которая вызывается при обнаружении нового
-или изменённого события. Список проектов получается автоматически через функцию
-fetch_all_projects, что позволяет работать со всеми доступными проектами и избегать
-уведомлений о старых событиях при запуске.
+Основная функция poll_all за один проход опрашивает пайплайны и merge request
+(через GraphQL API) и push-события и вызывает callback при обнаружении нового
+или изменённого события. Отдельные poll_pipeline_events, poll_push_events и
+poll_mr_events оставлены для совместимости и считаются устаревшими; при
+одновременной работе они разделяют один запрос списка проектов за интервал
+опроса.
+
+Список проектов получается автоматически через функцию fetch_all_projects, что
+позволяет работать со всеми доступными проектами и избегать уведомлений о старых
+событиях при запуске.
+После первого опроса запрашиваются только проекты с недавней активностью
+(last_activity_after); push-события и merge request опрашиваются лишь у них.
+Смена статуса пайплайна не обновляет last_activity_at проекта (например, у
+пайплайнов по расписанию или запущенных через API), поэтому пайплайны
+проверяются у всех известных проектов одним GraphQL запросом на пакет.
+Проекты без изменений опрашиваются всё реже (экспоненциальная задержка до
+пятикратного интервала опроса), при изменении интервал сбрасывается. Так же
+растёт и интервал между шагами опроса: он удваивается после каждого шага без
+изменений, но не больше max_interval (по умолчанию MAX_POLL_INTERVAL секунд).
 """
 
 import asyncio
-from time import localtime, strftime
-from typing import Awaitable, Callable, TypedDict, Union
+import logging
+import warnings
+from array import array
+from datetime import datetime, timedelta, timezone
+from time import localtime, monotonic, strftime
+from typing import AsyncIterator, Awaitable, Callable, TypedDict, Union
 
-from gitlab import api
+from gitlab import api, graphql
 
 
 class PipelineEvent(TypedDict):
@@ -53,6 +72,501 @@ class MergeRequestEvent(TypedDict):
 type Event = Union[PipelineEvent, PushEvent, MergeRequestEvent]
 type Callback = Callable[[Event], Awaitable[None]]
 
+# GitLab обновляет last_activity_at проекта не чаще одного раза в час.
+ACTIVITY_WINDOW = 3600
+# Предел, до которого растёт интервал опроса, пока изменений нет.
+MAX_POLL_INTERVAL = 60
+
+PIPELINE_STATUSES = (
+    'created',
+    'waiting_for_resource',
+    'preparing',
+    'pending',
+    'running',
+    'success',
+    'failed',
+    'canceling',
+    'canceled',
+    'skipped',
+    'manual',
+    'scheduled',
+)
+
+
+class _PipelineStates:
+    """
+    Последние известные пайплайны проектов.
+
+    Хранятся в параллельных массивах: идентификаторы пайплайнов в array('q'),
+    коды статусов в bytearray, а project_id отображается в индекс слота.
+    Статусы интернируются в небольшие целые числа, поэтому сравнение
+    состояния сводится к двум целочисленным чтениям.
+    """
+
+    def __init__(self) -> None:
+        self._slot_of: dict[int, int] = {}
+        self._pipeline_ids = array('q')
+        self._status_codes = bytearray()
+        self._statuses = list(PIPELINE_STATUSES)
+        self._status_code_of = {
+            status: code for code, status in enumerate(self._statuses)
+        }
+
+    def _intern(self, status: str) -> int:
+        """
+        Возвращает код статуса, добавляя неизвестный статус в таблицу.
+
+        :param status: Статус пайплайна.
+        :return: Код статуса.
+        """
+        code = self._status_code_of.get(status)
+        if code is None:
+            code = len(self._statuses)
+            self._statuses.append(status)
+            self._status_code_of[status] = code
+        return code
+
+    def update(self, project_id: int, pipeline_id: int, status: str) -> bool:
+        """
+        Сохраняет последний пайплайн проекта.
+
+        :param project_id: Идентификатор проекта.
+        :param pipeline_id: Идентификатор пайплайна.
+        :param status: Статус пайплайна.
+        :return: True, если пайплайн или его статус изменились с прошлого
+            опроса; False для неизменного или впервые увиденного проекта.
+        """
+        code = self._intern(status)
+        slot = self._slot_of.get(project_id)
+        if slot is None:
+            self._slot_of[project_id] = len(self._pipeline_ids)
+            self._pipeline_ids.append(pipeline_id)
+            self._status_codes.append(code)
+            return False
+        if (
+            self._pipeline_ids[slot] == pipeline_id
+            and self._status_codes[slot] == code
+        ):
+            return False
+        self._pipeline_ids[slot] = pipeline_id
+        self._status_codes[slot] = code
+        return True
+
+
+class _ProjectBackoff:
+    """
+    Индивидуальные интервалы опроса проектов.
+
+    Если при опросе проекта изменений не обнаружено, его интервал умножается
+    на factor (но не больше max_factor * base); при изменении интервал
+    сбрасывается до base.
+    """
+
+    def __init__(
+        self,
+        base: float,
+        factor: float = 1.5,
+        max_factor: float = 5,
+    ) -> None:
+        self._base = base
+        self._factor = factor
+        self._max_interval = base * max_factor
+        self._interval: dict[int, float] = {}
+        self._next_poll: dict[int, float] = {}
+
+    def eligible(
+        self,
+        projects: list[api.Project],
+        now: float,
+    ) -> list[api.Project]:
+        """
+        Отбирает проекты, время опроса которых уже наступило.
+
+        :param projects: Список проектов.
+        :param now: Текущее значение time.monotonic().
+        :return: Проекты, которые нужно опросить на этом шаге.
+        """
+        next_poll = self._next_poll
+        return [
+            project
+            for project in projects
+            if next_poll.get(project['id'], 0) <= now
+        ]
+
+    def record(self, project_id: int, changed: bool, now: float) -> None:
+        """
+        Обновляет интервал проекта по результату опроса.
+
+        :param project_id: Идентификатор проекта.
+        :param changed: Было ли обнаружено изменение.
+        :param now: Время опроса по time.monotonic().
+        """
+        if changed:
+            interval = self._base
+        else:
+            interval = min(
+                self._interval.get(project_id, self._base) * self._factor,
+                self._max_interval,
+            )
+        self._interval[project_id] = interval
+        self._next_poll[project_id] = now + interval
+
+
+class _Ticker:
+    """
+    Планировщик шагов опроса по монотонным дедлайнам.
+
+    Дедлайн следующего шага отсчитывается от предыдущего дедлайна, а не от
+    конца работы, поэтому длительность запросов не сдвигает частоту опроса.
+    Если шаг не уложился в интервал, пишется предупреждение и расписание
+    отсчитывается заново от текущего момента.
+
+    После каждого шага без изменений интервал удваивается (но не больше
+    max_interval), при обнаружении изменений сбрасывается до base.
+    """
+
+    def __init__(self, base: float, max_interval: float | None = None) -> None:
+        self._base = base
+        self._max_interval = max(base, max_interval or base)
+        self._interval = base
+        self._empty_runs = 0
+        self._deadline = monotonic()
+
+    def record(self, changed: bool) -> None:
+        """
+        Обновляет интервал по результату шага опроса.
+
+        :param changed: Были ли на шаге обнаружены изменения.
+        """
+        if changed:
+            self._empty_runs = 0
+            self._interval = self._base
+        elif self._interval < self._max_interval:
+            self._empty_runs += 1
+            self._interval = min(
+                self._max_interval,
+                self._base * 2**self._empty_runs,
+            )
+
+    async def wait(self) -> None:
+        """
+        Ожидает наступления следующего шага опроса.
+        """
+        started = self._deadline
+        self._deadline += self._interval
+        delay = self._deadline - monotonic()
+        if delay < 0:
+            logging.warning(
+                f'Шаг опроса GitLab занял {monotonic() - started:.1f} с при '
+                f'интервале {self._interval} с; уменьшите число проектов '
+                f'или увеличьте concurrency.'
+            )
+            self._deadline = monotonic()
+            delay = 0
+        await asyncio.sleep(delay)
+
+
+def _activity_since(
+    last_poll: datetime | None,
+    window: float,
+) -> datetime | None:
+    """
+    Вычисляет границу last_activity_after для очередного запроса проектов.
+
+    Граница сдвигается назад на window секунд и округляется до минуты, чтобы
+    поллеры разделяли один запрос списка проектов и его ETag.
+
+    :param last_poll: Время начала последнего успешного опроса.
+    :param window: Запас в секундах на задержку обновления активности.
+    :return: Граница активности или None для полного списка проектов.
+    """
+    if last_poll is None:
+        return None
+    since = last_poll - timedelta(seconds=window)
+    return since.replace(second=0, microsecond=0)
+
+
+def _diff_pipeline(
+    previous_status: _PipelineStates,
+    project: api.Project,
+    pipeline: api.Pipeline,
+    timestamp: str,
+) -> PipelineEvent | None:
+    """
+    Сравнивает последний пайплайн проекта с сохранённым состоянием.
+
+    :param previous_status: Состояние пайплайнов с прошлых опросов.
+    :param project: Проект.
+    :param pipeline: Последний пайплайн проекта.
+    :param timestamp: Время опроса.
+    :return: Событие, если пайплайн или его статус изменились, иначе None.
+    """
+    project_id = project['id']
+    pipeline_id = pipeline['id']
+    status = pipeline['status']
+    if not previous_status.update(project_id, pipeline_id, status):
+        return None
+    return {
+        'type': 'pipeline',
+        'project_id': project_id,
+        'project_name': project['name'],
+        'pipeline_id': pipeline_id,
+        'status': status,
+        'timestamp': timestamp,
+    }
+
+
+def _diff_push(
+    previous_push: dict[int, int],
+    project: api.Project,
+    events_list: list[api.RawEvent],
+    timestamp: str,
+) -> PushEvent | None:
+    """
+    Ищет новое push-событие проекта.
+
+    :param previous_push: Идентификаторы последних push-событий проектов.
+    :param project: Проект.
+    :param events_list: События проекта, от новых к старым.
+    :param timestamp: Время опроса.
+    :return: Событие, если появился новый push, иначе None.
+    """
+    latest_push = next(
+        (event for event in events_list if event.get('push_data')),
+        None,
+    )
+    if latest_push is None:
+        return None
+
+    project_id = project['id']
+    event_id = latest_push['id']
+    prev_id = previous_push.get(project_id)
+    previous_push[project_id] = event_id
+    if prev_id is None or event_id == prev_id:
+        return None
+    push_data = latest_push['push_data']
+    return {
+        'type': 'push',
+        'project_id': project_id,
+        'project_name': project['name'],
+        'event_id': event_id,
+        'branch': push_data['ref'],
+        'commit_count': push_data['commit_count'],
+        'timestamp': timestamp,
+        'author': latest_push['author_username'],
+    }
+
+
+def _diff_merge_request(
+    previous_mr: dict[int, dict[int, str]],
+    project: api.Project,
+    mrs: list[api.MergeRequest],
+    timestamp: str,
+) -> MergeRequestEvent | None:
+    """
+    Сравнивает состояние последнего merge request проекта с сохранённым.
+
+    :param previous_mr: Состояния merge request по проектам.
+    :param project: Проект.
+    :param mrs: Merge request проекта, от недавно обновлённых к старым.
+    :param timestamp: Время опроса.
+    :return: Событие, если состояние MR изменилось, иначе None.
+    """
+    if not mrs:
+        return None
+
+    project_id = project['id']
+    latest_mr = mrs[0]
+    mr_id = latest_mr['id']
+    current_state = latest_mr['state']
+    project_mrs = previous_mr.setdefault(project_id, {})
+    prev_state = project_mrs.get(mr_id)
+    project_mrs[mr_id] = current_state
+    if prev_state is None or prev_state == current_state:
+        return None
+    return {
+        'type': 'merge_request',
+        'project_id': project_id,
+        'project_name': project['name'],
+        'mr_id': mr_id,
+        'state': current_state,
+        'title': latest_mr.get('title', ''),
+        'timestamp': timestamp,
+        'author': latest_mr['author']['username'],
+        'iid': latest_mr.get('iid', 0),
+    }
+
+
+def _log_fetch_error(
+    result: object,
+    what: str,
+    project_id: int,
+) -> bool:
+    """
+    Логирует исключение, возвращённое asyncio.gather вместо результата.
+
+    :param result: Результат запроса или исключение.
+    :param what: Описание запрошенных данных для сообщения.
+    :param project_id: Идентификатор проекта.
+    :return: True, если результат является исключением.
+    """
+    if isinstance(result, BaseException):
+        logging.error(f'Ошибка получения {what} проекта {project_id}: {result}')
+        return True
+    return False
+
+
+class _PollLoop:
+    """
+    Общий цикл шагов опроса для всех поллеров.
+
+    Читает настройки опроса из конфигурации, ведёт расписание шагов
+    (_Ticker) и интервалы проектов (_ProjectBackoff) и на каждом шаге
+    получает список проектов, которые нужно опросить. Все когда-либо
+    полученные проекты хранятся в known_projects.
+    """
+
+    def __init__(self, gitlab_conf: api.GitlabConfig) -> None:
+        self.poll_interval = gitlab_conf.get('poll_interval', 5)
+        self.base_url = gitlab_conf.get('url', 'https://gitlab.com')
+        self.token = gitlab_conf.get('token', '')
+        self.activity_window = gitlab_conf.get('activity_window', ACTIVITY_WINDOW)
+        self.backoff = _ProjectBackoff(self.poll_interval)
+        self.ticker = _Ticker(
+            self.poll_interval,
+            gitlab_conf.get('max_interval', MAX_POLL_INTERVAL),
+        )
+        self.known_projects: dict[int, api.Project] = {}
+
+    async def ticks(self) -> AsyncIterator[tuple[list[api.Project], str, float]]:
+        """
+        Ожидает очередной шаг опроса и отдаёт проекты для него.
+
+        Шаги, на которых список проектов получить не удалось, пропускаются.
+        Результат шага вызывающий код сообщает через backoff.record и
+        ticker.record.
+
+        :return: Асинхронный итератор кортежей (недавно активные проекты,
+            время опроса которых наступило, время опроса для событий,
+            значение time.monotonic() на момент шага).
+        """
+        last_poll: datetime | None = None
+        while True:
+            await self.ticker.wait()
+            poll_started = datetime.now(timezone.utc)
+            projects = await api.fetch_all_projects(
+                self.base_url,
+                self.token,
+                ttl=self.poll_interval / 2,
+                since=_activity_since(last_poll, self.activity_window),
+            )
+            if projects is None:
+                continue
+            last_poll = poll_started
+            for project in projects:
+                self.known_projects[project['id']] = project
+            now = monotonic()
+            projects = self.backoff.eligible(projects, now)
+            yield projects, strftime('%Y-%m-%d %H:%M:%S', localtime()), now
+
+
+async def poll_all(
+    callback: Callback,
+    gitlab_conf: api.GitlabConfig,
+) -> None:
+    """
+    Опрос пайплайнов, push-событий и merge request для всех проектов GitLab.
+
+    На каждом шаге выполняется один запрос списка проектов, после чего
+    пайплайны и merge request (GraphQL запросом на пакет проектов) и
+    события проектов (REST, в GraphQL API их нет) недавно активных проектов
+    и пайплайны остальных известных проектов запрашиваются параллельно.
+    Вызывает callback для каждого обнаруженного нового или изменённого
+    события.
+    """
+    previous_status = _PipelineStates()
+    previous_push: dict[int, int] = {}
+    previous_mr: dict[int, dict[int, str]] = {}
+    first_run = True
+    polling = _PollLoop(gitlab_conf)
+    base_url, token = polling.base_url, polling.token
+    async for projects, timestamp, now in polling.ticks():
+        active_ids = {project['id'] for project in projects}
+        inactive = [
+            project
+            for project_id, project in polling.known_projects.items()
+            if project_id not in active_ids
+        ]
+        results = await asyncio.gather(
+            graphql.fetch_project_activity(projects, base_url, token),
+            graphql.fetch_latest_pipelines(inactive, base_url, token),
+            *(
+                api.fetch_project_events(project['id'], base_url, token)
+                for project in projects
+            ),
+            return_exceptions=True,
+        )
+        activity = results[0]
+        if isinstance(activity, BaseException):
+            logging.error(f'Ошибка получения активности проектов: {activity}')
+            activity = None
+        pipelines = results[1]
+        if isinstance(pipelines, BaseException):
+            logging.error(f'Ошибка получения пайплайнов проектов: {pipelines}')
+            pipelines = None
+
+        changed = False
+        for project, events_list in zip(projects, results[2:]):
+            project_id = project['id']
+            found: list[Event] = []
+            project_activity = activity.get(project_id) if activity else None
+            pipeline = project_activity.get('pipeline') if project_activity else None
+            if pipeline:
+                event = _diff_pipeline(previous_status, project, pipeline, timestamp)
+                if event:
+                    found.append(event)
+            events_fetched = events_list is not None and not _log_fetch_error(
+                events_list,
+                'событий',
+                project_id,
+            )
+            if events_fetched and events_list:
+                event = _diff_push(previous_push, project, events_list, timestamp)
+                if event:
+                    found.append(event)
+            if project_activity and project_activity.get('merge_requests'):
+                event = _diff_merge_request(
+                    previous_mr,
+                    project,
+                    project_activity['merge_requests'],
+                    timestamp,
+                )
+                if event:
+                    found.append(event)
+
+            # Неудачный запрос не говорит об отсутствии изменений, поэтому
+            # расписание проекта в этом случае остаётся прежним.
+            if project_activity is not None and events_fetched:
+                polling.backoff.record(project_id, bool(found), now)
+            changed = changed or bool(found)
+            if not first_run:
+                for event in found:
+                    await callback(event)
+
+        for project in inactive:
+            pipeline = pipelines.get(project['id']) if pipelines else None
+            if not pipeline:
+                continue
+            event = _diff_pipeline(previous_status, project, pipeline, timestamp)
+            if event is None:
+                continue
+            polling.backoff.record(project['id'], True, now)
+            changed = True
+            if not first_run:
+                await callback(event)
+        polling.ticker.record(changed)
+        first_run = False
+
 
 async def poll_pipeline_events(
     callback: Callback,
@@ -61,51 +575,38 @@ async def poll_pipeline_events(
     """
     Опрос CI/CD пайплайнов для всех проектов GitLab.
     Вызывает callback при обнаружении нового или изменённого пайплайна.
+
+    Устарела: используйте poll_all, который опрашивает все типы событий
+    за один проход.
     """
-    previous_status: dict[int, api.Pipeline] = {}
+    warnings.warn(
+        'poll_pipeline_events устарела, используйте poll_all',
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    previous_status = _PipelineStates()
     first_run = True
-    poll_interval = gitlab_conf.get('poll_interval', 5)
-    base_url = gitlab_conf.get('url', 'https://gitlab.com')
-    token = gitlab_conf.get('token', '')
-
-    while True:
-        await asyncio.sleep(poll_interval)
-        projects = await api.fetch_all_projects(
+    polling = _PollLoop(gitlab_conf)
+    base_url, token = polling.base_url, polling.token
+    async for _, timestamp, _ in polling.ticks():
+        projects = list(polling.known_projects.values())
+        pipelines = await graphql.fetch_latest_pipelines(
+            projects,
             base_url,
             token,
         )
-        if not projects:
+        if pipelines is None:
             continue
+        changed = False
         for project in projects:
-            project_id = project['id']
-            project_name = project['name']
-            pipeline = await api.fetch_pipeline(project_id, base_url, token)
-            if not pipeline:
-                continue
-            pipeline_id = pipeline['id']
-            status = pipeline['status']
-            prev = previous_status.get(project_id)
-            if prev is None:
-                previous_status[project_id] = api.Pipeline(
-                    id=pipeline_id,
-                    status=status,
-                )
-                continue
-            if prev['id'] != pipeline_id or prev['status'] != status:
-                previous_status[project_id] = api.Pipeline(
-                    id=pipeline_id,
-                    status=status,
-                )
-                if not first_run:
-                    event: PipelineEvent = {
-                        'type': 'pipeline',
-                        'project_id': project_id,
-                        'project_name': project_name,
-                        'pipeline_id': pipeline_id,
-                        'status': status,
-                        'timestamp': strftime('%Y-%m-%d %H:%M:%S', localtime()),
-                    }
-                    await callback(event)
+            pipeline = pipelines.get(project['id'])
+            event = None
+            if pipeline:
+                event = _diff_pipeline(previous_status, project, pipeline, timestamp)
+            changed = changed or event is not None
+            if event and not first_run:
+                await callback(event)
+        polling.ticker.record(changed)
         first_run = False
 
 
@@ -116,59 +617,43 @@ async def poll_push_events(
     """
     Опрос push-событий для всех проектов GitLab.
     Вызывает callback при обнаружении нового события.
+
+    Устарела: используйте poll_all, который опрашивает все типы событий
+    за один проход.
     """
+    warnings.warn(
+        'poll_push_events устарела, используйте poll_all',
+        DeprecationWarning,
+        stacklevel=2,
+    )
     previous_push: dict[int, int] = {}
     first_run = True
-    poll_interval = gitlab_conf.get('poll_interval', 5)
-    base_url = gitlab_conf.get('url', 'https://gitlab.com')
-    token = gitlab_conf.get('token', '')
-
-    while True:
-        await asyncio.sleep(poll_interval)
-        projects = await api.fetch_all_projects(
-            base_url,
-            token,
+    polling = _PollLoop(gitlab_conf)
+    base_url, token = polling.base_url, polling.token
+    async for projects, timestamp, now in polling.ticks():
+        results = await asyncio.gather(
+            *(
+                api.fetch_project_events(project['id'], base_url, token)
+                for project in projects
+            ),
+            return_exceptions=True,
         )
-        if not projects:
-            continue
-        for project in projects:
-            project_id = project['id']
-            project_name = project['name']
-            events_list = await api.fetch_project_events(
-                project_id,
-                base_url,
-                token,
-            )
-            if not events_list:
-                continue
-
-            push_events = [event for event in events_list if event['push_data']]
-            if not push_events:
-                continue
-
-            latest_push = push_events[0]
-            event_id = latest_push['id']
-            prev_id = previous_push.get(project_id)
-            if prev_id is None:
-                previous_push[project_id] = event_id
+        changed = False
+        for project, events_list in zip(projects, results):
+            if events_list is None or _log_fetch_error(
+                events_list,
+                'событий',
+                project['id'],
+            ):
                 continue
-            if event_id != prev_id:
-                previous_push[project_id] = event_id
-                push_data = latest_push['push_data']
-                branch = push_data['ref']
-                commit_count = push_data['commit_count']
-                if not first_run:
-                    event: PushEvent = {
-                        'type': 'push',
-                        'project_id': project_id,
-                        'project_name': project_name,
-                        'event_id': event_id,
-                        'branch': branch,
-                        'commit_count': commit_count,
-                        'timestamp': strftime('%Y-%m-%d %H:%M:%S', localtime()),
-                        'author': latest_push['author_username'],
-                    }
-                    await callback(event)
+            event = None
+            if events_list:
+                event = _diff_push(previous_push, project, events_list, timestamp)
+            polling.backoff.record(project['id'], event is not None, now)
+            changed = changed or event is not None
+            if event and not first_run:
+                await callback(event)
+        polling.ticker.record(changed)
         first_run = False
 
 
@@ -179,48 +664,41 @@ async def poll_mr_events(
     """
     Опрос событий merge request для всех проектов GitLab.
     Вызывает callback при обнаружении нового или изменённого MR.
+
+    Устарела: используйте poll_all, который опрашивает все типы событий
+    за один проход.
     """
+    warnings.warn(
+        'poll_mr_events устарела, используйте poll_all',
+        DeprecationWarning,
+        stacklevel=2,
+    )
     previous_mr: dict[int, dict[int, str]] = {}
     first_run = True
-    poll_interval = gitlab_conf.get('poll_interval', 5)
-    base_url = gitlab_conf.get('url', 'https://gitlab.com')
-    token = gitlab_conf.get('token', '')
-
-    while True:
-        await asyncio.sleep(poll_interval)
-        projects = await api.fetch_all_projects(
-            base_url,
-            token,
+    polling = _PollLoop(gitlab_conf)
+    base_url, token = polling.base_url, polling.token
+    async for projects, timestamp, now in polling.ticks():
+        results = await asyncio.gather(
+            *(
+                api.fetch_merge_requests(project['id'], base_url, token)
+                for project in projects
+            ),
+            return_exceptions=True,
         )
-        if not projects:
-            continue
-        for project in projects:
-            project_id = project['id']
-            project_name = project['name']
-            mrs = await api.fetch_merge_requests(project_id, base_url, token)
-            if not mrs:
-                continue
-
-            latest_mr = mrs[0]
-            mr_id = latest_mr['id']
-            current_state = latest_mr['state']
-            prev_state = previous_mr.get(project_id, {}).get(mr_id)
-            if prev_state is None:
-                previous_mr.setdefault(project_id, {})[mr_id] = current_state
+        changed = False
+        for project, mrs in zip(projects, results):
+            if mrs is None or _log_fetch_error(
+                mrs,
+                'merge requests',
+                project['id'],
+            ):
                 continue
-            if prev_state != current_state:
-                previous_mr.setdefault(project_id, {})[mr_id] = current_state
-                if not first_run:
-                    event: MergeRequestEvent = {
-                        'type': 'merge_request',
-                        'project_id': project_id,
-                        'project_name': project_name,
-                        'mr_id': mr_id,
-                        'state': current_state,
-                        'title': latest_mr.get('title', ''),
-                        'timestamp': strftime('%Y-%m-%d %H:%M:%S', localtime()),
-                        'author': latest_mr['author']['username'],
-                        'iid': latest_mr.get('iid', 0),
-                    }
-                    await callback(event)
+            event = None
+            if mrs:
+                event = _diff_merge_request(previous_mr, project, mrs, timestamp)
+            polling.backoff.record(project['id'], event is not None, now)
+            changed = changed or event is not None
+            if event and not first_run:
+                await callback(event)
+        polling.ticker.record(changed)
         first_run = False
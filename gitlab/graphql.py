@@ -0,0 +1,218 @@
+"""
+Модуль для работы с GraphQL API GitLab.
+=======================================
+
+Содержит функции, которые получают данные сразу для многих проектов одним
+запросом к {base_url}/api/graphql вместо отдельного REST запроса на каждый
+проект. Проекты запрашиваются через псевдонимы p0, p1, ... и разбиваются на
+пакеты, чтобы не превышать ограничения GitLab на сложность запроса.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, TypedDict
+
+from .api import MergeRequest, Pipeline, Project, auth_headers
+from .http_client import post_json
+
+BATCH_SIZE = 50
+# Запрос merge request заметно сложнее, поэтому пакеты с ними меньше.
+ACTIVITY_BATCH_SIZE = 10
+MERGE_REQUESTS_PER_PROJECT = 5
+
+_PIPELINE_FIELDS = 'pipelines(first: 1) { nodes { id status } }'
+_MERGE_REQUEST_FIELDS = (
+    f'mergeRequests(sort: UPDATED_DESC, first: {MERGE_REQUESTS_PER_PROJECT}) '
+    '{ nodes { id iid title state author { username } } }'
+)
+
+
+class ProjectActivity(TypedDict, total=False):
+    pipeline: Pipeline
+    merge_requests: list[MergeRequest]
+
+
+def _gid_to_id(gid: str) -> int:
+    """
+    Преобразует глобальный идентификатор GraphQL в числовой.
+
+    :param gid: Идентификатор вида "gid://gitlab/Ci::Pipeline/123".
+    :return: Числовой идентификатор.
+    """
+    return int(gid.rsplit('/', 1)[-1])
+
+
+def _parse_pipeline(project_data: dict[str, Any]) -> Pipeline | None:
+    """
+    Извлекает последний пайплайн из данных проекта.
+
+    :param project_data: Данные проекта из ответа GraphQL.
+    :return: Пайплайн или None, если пайплайнов нет или они недоступны
+        (CI отключён или у токена нет прав, тогда GitLab возвращает null).
+    """
+    nodes = (project_data.get('pipelines') or {}).get('nodes')
+    if not nodes:
+        return None
+    return Pipeline(
+        id=_gid_to_id(nodes[0]['id']),
+        status=nodes[0]['status'].lower(),
+    )
+
+
+def _parse_merge_requests(project_data: dict[str, Any]) -> list[MergeRequest]:
+    """
+    Извлекает merge request из данных проекта в том же виде, что и REST API.
+
+    :param project_data: Данные проекта из ответа GraphQL.
+    :return: Merge request от недавно обновлённых к старым; пустой список,
+        если merge request недоступны и GitLab вернул null.
+    """
+    nodes = (project_data.get('mergeRequests') or {}).get('nodes') or []
+    return [
+        MergeRequest(
+            id=_gid_to_id(node['id']),
+            iid=int(node['iid']),
+            title=node['title'],
+            state=node['state'],
+            author={
+                'username': (node.get('author') or {}).get('username', 'GitLab')
+            },
+        )
+        for node in nodes
+    ]
+
+
+async def _fetch_batch(
+    projects: list[Project],
+    url: str,
+    headers: dict[str, str],
+    fields: str,
+) -> dict[int, dict[str, Any]] | None:
+    """
+    Запрашивает поля fields для одного пакета проектов.
+
+    :param projects: Проекты пакета.
+    :param url: URL GraphQL API.
+    :param headers: HTTP заголовки запроса.
+    :param fields: Поля проекта в синтаксисе GraphQL.
+    :return: Словарь {project_id: данные проекта} или None в случае ошибки.
+        Проекты, которых нет в ответе, в словарь не попадают.
+    """
+    aliases = []
+    for index, project in enumerate(projects):
+        path = json.dumps(project['path_with_namespace'])
+        aliases.append(f'p{index}: project(fullPath: {path}) {{ {fields} }}')
+    query = '{ ' + ' '.join(aliases) + ' }'
+    response = await post_json(url, {'query': query}, headers)
+    if response is None:
+        return None
+    if response.get('errors'):
+        logging.error(f'GraphQL запрос вернул ошибки: {response["errors"]}')
+    data = response.get('data') or {}
+
+    result: dict[int, dict[str, Any]] = {}
+    for index, project in enumerate(projects):
+        project_data = data.get(f'p{index}')
+        if project_data:
+            result[project['id']] = project_data
+    return result
+
+
+async def _fetch_all(
+    projects: list[Project],
+    base_url: str,
+    token: str,
+    fields: str,
+    batch_size: int,
+) -> dict[int, dict[str, Any]] | None:
+    """
+    Запрашивает поля fields для всех проектов параллельными пакетами.
+
+    :param projects: Список проектов (нужны id и path_with_namespace).
+    :param base_url: Базовый URL GitLab.
+    :param token: Персональный токен для доступа к API GitLab.
+    :param fields: Поля проекта в синтаксисе GraphQL.
+    :param batch_size: Количество проектов в одном запросе.
+    :return: Словарь {project_id: данные проекта} или None, если ни один
+        пакет не удалось получить.
+    """
+    url = f'{base_url}/api/graphql'
+    headers = auth_headers(token)
+    batches = await asyncio.gather(
+        *(
+            _fetch_batch(projects[i : i + batch_size], url, headers, fields)
+            for i in range(0, len(projects), batch_size)
+        )
+    )
+    if batches and all(batch is None for batch in batches):
+        return None
+    result: dict[int, dict[str, Any]] = {}
+    for batch in batches:
+        if batch is not None:
+            result.update(batch)
+    return result
+
+
+async def fetch_latest_pipelines(
+    projects: list[Project],
+    base_url: str,
+    token: str,
+) -> dict[int, Pipeline] | None:
+    """
+    Получает последний пайплайн для каждого из проектов через GraphQL API.
+
+    :param projects: Список проектов (нужны id и path_with_namespace).
+    :param base_url: Базовый URL GitLab.
+    :param token: Персональный токен для доступа к API GitLab.
+    :return: Словарь {project_id: пайплайн} или None, если ни один пакет
+        не удалось получить. Проекты без пайплайнов в словарь не попадают.
+    """
+    data = await _fetch_all(projects, base_url, token, _PIPELINE_FIELDS, BATCH_SIZE)
+    if data is None:
+        logging.error('Не удалось получить пайплайны через GraphQL.')
+        return None
+    pipelines: dict[int, Pipeline] = {}
+    for project_id, project_data in data.items():
+        pipeline = _parse_pipeline(project_data)
+        if pipeline:
+            pipelines[project_id] = pipeline
+    return pipelines
+
+
+async def fetch_project_activity(
+    projects: list[Project],
+    base_url: str,
+    token: str,
+) -> dict[int, ProjectActivity] | None:
+    """
+    Получает последний пайплайн и недавно обновлённые merge request каждого
+    из проектов через GraphQL API, одним запросом на пакет проектов.
+
+    :param projects: Список проектов (нужны id и path_with_namespace).
+    :param base_url: Базовый URL GitLab.
+    :param token: Персональный токен для доступа к API GitLab.
+    :return: Словарь {project_id: активность проекта} или None, если ни один
+        пакет не удалось получить. Проекты, которых нет в ответе, в словарь
+        не попадают.
+    """
+    data = await _fetch_all(
+        projects,
+        base_url,
+        token,
+        f'{_PIPELINE_FIELDS} {_MERGE_REQUEST_FIELDS}',
+        ACTIVITY_BATCH_SIZE,
+    )
+    if data is None:
+        logging.error('Не удалось получить активность проектов через GraphQL.')
+        return None
+    activity: dict[int, ProjectActivity] = {}
+    for project_id, project_data in data.items():
+        project_activity = ProjectActivity(
+            merge_requests=_parse_merge_requests(project_data),
+        )
+        pipeline = _parse_pipeline(project_data)
+        if pipeline:
+            project_activity['pipeline'] = pipeline
+        activity[project_id] = project_activity
+    return activity
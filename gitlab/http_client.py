@@ -2,14 +2,157 @@
 Модуль для работы с HTTP запросами через aiohttp.
 ==================================================
 
-Содержит обёртку для выполнения GET запросов, возврата JSON ответа и обработки ошибок.
+Содержит обёртки для выполнения GET и POST запросов, возврата JSON ответа и
+обработки ошибок.
+Тело ответа разбирается через orjson напрямую из байтов. Сессия использует
+пул постоянных соединений и запрашивает сжатые ответы.
+Количество одновременных запросов ограничивается общим семафором, чтобы
+параллельный опрос проектов не упирался в лимиты GitLab. Сессия создаётся при
+первом запросе под блокировкой и закрывается через close_session(), которая
+сначала отменяет выполняющиеся GET запросы.
+
+Ответы кешируются вместе с заголовками ETag и Last-Modified: повторный запрос
+отправляется с If-None-Match и/или If-Modified-Since, и при ответе 304
+возвращаются ранее разобранные данные без повторной загрузки и разбора тела.
+Одинаковые GET запросы, выполняющиеся одновременно, объединяются в один.
 """
 
+import asyncio
 import logging
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, NamedTuple
 
 import aiohttp
+import orjson
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+ETAG_CACHE_SIZE = 1024
+
+_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
+
+
+class _CachedResponse(NamedTuple):
+    etag: str | None
+    last_modified: str | None
+    data: Any
+    headers: Mapping[str, str]
+
+
+class _SessionHolder:
+    """
+    Хранит общую сессию aiohttp и семафор, ограничивающий число запросов.
+
+    Создание защищено блокировкой, чтобы одновременные первые запросы не
+    создали несколько сессий.
+    """
 
-session = None
+    def __init__(self) -> None:
+        self.session: aiohttp.ClientSession | None = None
+        self.sem: asyncio.Semaphore | None = None
+        self.concurrency = DEFAULT_CONCURRENCY
+        self.lock = asyncio.Lock()
+
+    async def get(self) -> tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        """
+        Возвращает сессию и семафор, создавая их внутри текущего цикла событий.
+
+        :return: Пара (сессия, семафор).
+        """
+        if self.session is not None and self.sem is not None:
+            if not self.session.closed:
+                return self.session, self.sem
+        async with self.lock:
+            if self.session is None or self.session.closed:
+                self.session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=100,
+                        limit_per_host=32,
+                        ttl_dns_cache=300,
+                        keepalive_timeout=75,
+                    ),
+                    headers=DEFAULT_HEADERS,
+                )
+            if self.sem is None:
+                self.sem = asyncio.Semaphore(self.concurrency)
+            return self.session, self.sem
+
+    async def close(self) -> None:
+        """
+        Закрывает сессию и пул соединений.
+        """
+        async with self.lock:
+            if self.session is not None:
+                await self.session.close()
+            self.session = None
+            self.sem = None
+
+
+_holder = _SessionHolder()
+_etag_cache: OrderedDict[str, _CachedResponse] = OrderedDict()
+_inflight: dict[
+    tuple[str, str, frozenset[tuple[str, str]]],
+    asyncio.Task[tuple[Any, Mapping[str, str]] | None],
+] = {}
+
+
+def _cache_store(url: str, cached: _CachedResponse) -> None:
+    """
+    Сохраняет ответ в кеше условных запросов, вытесняя самые старые записи.
+
+    :param url: URL запроса.
+    :param cached: Валидаторы, разобранные данные и заголовки ответа.
+    """
+    _etag_cache[url] = cached
+    _etag_cache.move_to_end(url)
+    while len(_etag_cache) > ETAG_CACHE_SIZE:
+        _etag_cache.popitem(last=False)
+
+
+def set_concurrency_limit(limit: int) -> None:
+    """
+    Задаёт максимальное количество одновременных HTTP запросов.
+
+    Должна вызываться до первого запроса: семафор создаётся лениво внутри
+    запущенного цикла событий и после этого не пересоздаётся.
+
+    :param limit: Максимальное количество одновременных запросов.
+    """
+    _holder.concurrency = max(1, int(limit))
+
+
+async def close_session() -> None:
+    """
+    Отменяет выполняющиеся GET запросы и закрывает общую HTTP сессию.
+    Следующий запрос создаст новую.
+
+    Объединённые запросы выполняются в отдельных задачах под asyncio.shield и
+    не отменяются вместе с ожидающим их кодом, поэтому без отмены они
+    продолжили бы работать с уже закрытым пулом соединений.
+    """
+    tasks = list(_inflight.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await _holder.close()
+
+
+def parse_link_header(header: str | None, rel: str) -> str | None:
+    """
+    Извлекает URL с указанным rel из заголовка Link.
+
+    :param header: Значение заголовка Link.
+    :param rel: Тип ссылки (например, "next").
+    :return: URL ссылки или None, если она отсутствует.
+    """
+    if not header:
+        return None
+    for link_url, link_rel in _LINK_RE.findall(header):
+        if link_rel == rel:
+            return link_url
+    return None
 
 
 async def get_json(
@@ -19,24 +162,128 @@ async def get_json(
     """
     Выполняет GET запрос по указанному URL и возвращает данные в формате JSON.
 
-    :param session: Используемая сессия aiohttp.
     :param url: URL для запроса.
     :param headers: HTTP заголовки, если необходимы.
     :return: Десериализованные данные из JSON или None в случае ошибки.
     """
-    global session
-    if not session:
-        session = aiohttp.ClientSession()
+    result = await get_json_with_headers(url, headers)
+    if result is None:
+        return None
+    return result[0]
+
+
+async def get_json_with_headers(
+    url: str,
+    headers: dict | None = None,
+) -> tuple[Any, Mapping[str, str]] | None:
+    """
+    Выполняет GET запрос и возвращает данные в формате JSON вместе с
+    заголовками ответа. Если такой же запрос (URL и заголовки) уже
+    выполняется, ожидает его результат вместо отправки нового.
+
+    :param url: URL для запроса.
+    :param headers: HTTP заголовки, если необходимы.
+    :return: Пара (данные, заголовки ответа) или None в случае ошибки.
+    """
+    key = ('GET', url, frozenset((headers or {}).items()))
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_get_json_with_headers(url, headers))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _get_json_with_headers(
+    url: str,
+    headers: dict | None = None,
+) -> tuple[Any, Mapping[str, str]] | None:
+    """
+    Выполняет GET запрос. Если для URL сохранён ETag или Last-Modified, запрос
+    выполняется условно, и при ответе 304 возвращаются данные из кеша.
+
+    :param url: URL для запроса.
+    :param headers: HTTP заголовки, если необходимы.
+    :return: Пара (данные, заголовки ответа) или None в случае ошибки.
+    """
+    session, sem = await _holder.get()
+
+    cached = _etag_cache.get(url)
+    if cached is not None:
+        etag, last_modified, _, _ = cached
+        headers = dict(headers or {})
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
 
     try:
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
+        async with sem:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cached is not None:
+                    _cache_store(url, cached)
+                    return cached.data, cached.headers
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    if etag or last_modified:
+                        _cache_store(
+                            url,
+                            _CachedResponse(
+                                etag,
+                                last_modified,
+                                data,
+                                response.headers,
+                            ),
+                        )
+                    return data, response.headers
+                else:
+                    logging.error(
+                        f'HTTP GET запрос по {url} вернул статус {response.status}'
+                    )
+                    return None
+    except aiohttp.ClientError as e:
+        logging.error(f'Ошибка HTTP GET запроса по {url}: {e}')
+        return None
+    except orjson.JSONDecodeError as e:
+        logging.error(f'Некорректный JSON в ответе на запрос по {url}: {e}')
+        return None
+
+
+async def post_json(
+    url: str,
+    payload: Any,
+    headers: dict | None = None,
+):
+    """
+    Выполняет POST запрос с телом в формате JSON и возвращает разобранный ответ.
+    Ответы на POST запросы не кешируются.
+
+    :param url: URL для запроса.
+    :param payload: Данные, сериализуемые в тело запроса.
+    :param headers: HTTP заголовки, если необходимы.
+    :return: Десериализованные данные из JSON или None в случае ошибки.
+    """
+    session, sem = await _holder.get()
+    headers = {**(headers or {}), 'Content-Type': 'application/json'}
+
+    try:
+        async with sem:
+            async with session.post(
+                url,
+                data=orjson.dumps(payload),
+                headers=headers,
+            ) as response:
+                if response.status == 200:
+                    return orjson.loads(await response.read())
                 logging.error(
-                    f'HTTP GET запрос по {url} вернул статус {response.status}'
+                    f'HTTP POST запрос по {url} вернул статус {response.status}'
                 )
                 return None
     except aiohttp.ClientError as e:
-        logging.error(f'Ошибка HTTP GET запроса по {url}: {e}')
+        logging.error(f'Ошибка HTTP POST запроса по {url}: {e}')
+        return None
+    except orjson.JSONDecodeError as e:
+        logging.error(f'Некорректный JSON в ответе на запрос по {url}: {e}')
         return None
@@ -0,0 +1,294 @@
+"""
+Модуль для приёма webhook-событий GitLab.
+=========================================
+
+Содержит HTTP сервер на aiohttp.web, который принимает события Pipeline, Push и
+Merge Request от GitLab, приводит их к тому же виду, что и события из модуля
+gitlab/events.py, и передаёт в callback. В отличие от опроса API, запросы к GitLab
+не выполняются вовсе, а уведомление отправляется сразу после события.
+Тело запроса декодируется msgspec сразу в структуры, содержащие только
+используемые поля.
+
+Маршруты:
+  /webhook               - любое событие, тип определяется по заголовку
+                           X-Gitlab-Event,
+  /webhook/pipeline      - Pipeline Hook,
+  /webhook/push          - Push Hook,
+  /webhook/merge_request - Merge Request Hook.
+
+Из Merge Request Hook уведомление создаётся только для действий, меняющих
+состояние MR (open, close, reopen, merge); остальные действия (update,
+approved и т.п.) принимаются и пропускаются. В отличие от опроса API, где
+впервые увиденный MR только запоминается, об открытии MR уведомление
+отправляется.
+
+Если в конфигурации задан webhook_secret, запросы без совпадающего заголовка
+X-Gitlab-Token отклоняются.
+"""
+
+import asyncio
+import hmac
+import logging
+from time import localtime, strftime
+from typing import Callable
+
+import msgspec
+from aiohttp import web
+
+from gitlab import api, events
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8080
+
+_background_tasks: set[asyncio.Task[None]] = set()
+
+
+def _callback_done(task: asyncio.Task[None]) -> None:
+    """
+    Забывает завершившуюся задачу обработки события и логирует исключение,
+    которым она завершилась.
+
+    :param task: Завершившаяся задача.
+    """
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logging.error(f'Ошибка обработки события webhook: {exc}', exc_info=exc)
+
+
+def _timestamp() -> str:
+    """
+    Возвращает текущее время в формате, используемом в событиях.
+    """
+    return strftime('%Y-%m-%d %H:%M:%S', localtime())
+
+
+class _Project(msgspec.Struct):
+    id: int
+    name: str
+
+
+class _PipelineAttributes(msgspec.Struct):
+    id: int
+    status: str
+
+
+class _PipelineHook(msgspec.Struct):
+    project: _Project
+    object_attributes: _PipelineAttributes
+
+
+class _PushHook(msgspec.Struct):
+    project_id: int
+    project: _Project
+    ref: str
+    total_commits_count: int = 0
+    user_username: str = 'GitLab'
+
+
+class _User(msgspec.Struct):
+    username: str = 'GitLab'
+
+
+class _MergeRequestAttributes(msgspec.Struct):
+    id: int
+    state: str
+    title: str = ''
+    iid: int = 0
+    action: str = ''
+
+
+class _MergeRequestHook(msgspec.Struct):
+    project: _Project
+    object_attributes: _MergeRequestAttributes
+    user: _User = msgspec.field(default_factory=_User)
+
+
+_pipeline_decoder = msgspec.json.Decoder(_PipelineHook)
+_push_decoder = msgspec.json.Decoder(_PushHook)
+_merge_request_decoder = msgspec.json.Decoder(_MergeRequestHook)
+
+# Действия Merge Request Hook, при которых меняется состояние MR.
+_MERGE_REQUEST_ACTIONS = frozenset({'open', 'close', 'reopen', 'merge'})
+
+
+def _pipeline_event(body: bytes) -> events.PipelineEvent:
+    """
+    Преобразует тело Pipeline Hook в событие пайплайна.
+
+    :param body: Тело запроса GitLab.
+    :return: Событие пайплайна.
+    """
+    payload = _pipeline_decoder.decode(body)
+    return {
+        'type': 'pipeline',
+        'project_id': payload.project.id,
+        'project_name': payload.project.name,
+        'pipeline_id': payload.object_attributes.id,
+        'status': payload.object_attributes.status,
+        'timestamp': _timestamp(),
+    }
+
+
+def _push_event(body: bytes) -> events.PushEvent:
+    """
+    Преобразует тело Push Hook в push-событие.
+
+    :param body: Тело запроса GitLab.
+    :return: Push-событие.
+    """
+    payload = _push_decoder.decode(body)
+    return {
+        'type': 'push',
+        'project_id': payload.project_id,
+        'project_name': payload.project.name,
+        # В webhook нет идентификатора события из Events API.
+        'event_id': 0,
+        'branch': payload.ref.removeprefix('refs/heads/'),
+        'commit_count': payload.total_commits_count,
+        'timestamp': _timestamp(),
+        'author': payload.user_username,
+    }
+
+
+def _merge_request_event(body: bytes) -> events.MergeRequestEvent | None:
+    """
+    Преобразует тело Merge Request Hook в событие merge request.
+
+    :param body: Тело запроса GitLab.
+    :return: Событие merge request или None, если действие не меняет
+        состояние MR.
+    """
+    payload = _merge_request_decoder.decode(body)
+    attributes = payload.object_attributes
+    if attributes.action not in _MERGE_REQUEST_ACTIONS:
+        return None
+    return {
+        'type': 'merge_request',
+        'project_id': payload.project.id,
+        'project_name': payload.project.name,
+        'mr_id': attributes.id,
+        'state': attributes.state,
+        'title': attributes.title,
+        'timestamp': _timestamp(),
+        'author': payload.user.username,
+        'iid': attributes.iid,
+    }
+
+
+# Преобразователи тела запроса по значению заголовка X-Gitlab-Event.
+_NORMALIZERS: dict[str, Callable[[bytes], events.Event | None]] = {
+    'Pipeline Hook': _pipeline_event,
+    'Push Hook': _push_event,
+    'Merge Request Hook': _merge_request_event,
+}
+
+
+def _make_handler(
+    normalize: Callable[[bytes], events.Event | None] | None,
+    callback: events.Callback,
+    secret: str,
+):
+    """
+    Создаёт обработчик маршрута webhook.
+
+    Обработчик проверяет токен, разбирает тело запроса и сразу отвечает 204;
+    callback выполняется в фоновой задаче, чтобы GitLab не ждал отправки
+    уведомления. Если normalize вернула None, событие пропускается. Если
+    normalize не задана, функция преобразования выбирается по заголовку
+    X-Gitlab-Event, а события других типов принимаются и пропускаются.
+
+    :param normalize: Функция преобразования тела запроса в событие.
+    :param callback: Функция обработки события.
+    :param secret: Ожидаемое значение заголовка X-Gitlab-Token.
+    :return: Обработчик запроса aiohttp.
+    """
+
+    # compare_digest принимает str только из ASCII символов, поэтому токены
+    # сравниваются как байты.
+    expected = secret.encode()
+
+    async def handler(request: web.Request) -> web.Response:
+        token = request.headers.get('X-Gitlab-Token', '')
+        if secret and not hmac.compare_digest(
+            token.encode('utf-8', 'surrogateescape'),
+            expected,
+        ):
+            return web.Response(status=401)
+        convert = normalize
+        if convert is None:
+            convert = _NORMALIZERS.get(request.headers.get('X-Gitlab-Event', ''))
+            if convert is None:
+                return web.Response(status=204)
+        try:
+            event = convert(await request.read())
+        except ValueError as e:
+            logging.error(f'Некорректное тело webhook {request.path}: {e}')
+            return web.Response(status=400)
+        if event is None:
+            return web.Response(status=204)
+
+        task = asyncio.create_task(callback(event))
+        _background_tasks.add(task)
+        task.add_done_callback(_callback_done)
+        return web.Response(status=204)
+
+    return handler
+
+
+def create_app(
+    callback: events.Callback,
+    gitlab_conf: api.GitlabConfig,
+) -> web.Application:
+    """
+    Создаёт приложение aiohttp с маршрутами webhook GitLab.
+
+    :param callback: Функция, вызываемая для каждого события.
+    :param gitlab_conf: Секция конфигурации [gitlab] из config.toml.
+    :return: Приложение aiohttp.
+    """
+    secret = gitlab_conf.get('webhook_secret', '')
+    if not secret:
+        logging.warning(
+            'webhook_secret не задан: запросы webhook принимаются без проверки.'
+        )
+    app = web.Application()
+    app.router.add_post('/webhook', _make_handler(None, callback, secret))
+    app.router.add_post(
+        '/webhook/pipeline',
+        _make_handler(_pipeline_event, callback, secret),
+    )
+    app.router.add_post(
+        '/webhook/push',
+        _make_handler(_push_event, callback, secret),
+    )
+    app.router.add_post(
+        '/webhook/merge_request',
+        _make_handler(_merge_request_event, callback, secret),
+    )
+    return app
+
+
+async def serve(
+    callback: events.Callback,
+    gitlab_conf: api.GitlabConfig,
+) -> None:
+    """
+    Запускает HTTP сервер для приёма webhook GitLab и работает до отмены.
+
+    :param callback: Функция, вызываемая для каждого события.
+    :param gitlab_conf: Секция конфигурации [gitlab] из config.toml.
+    """
+    runner = web.AppRunner(create_app(callback, gitlab_conf))
+    await runner.setup()
+    host = gitlab_conf.get('webhook_host', DEFAULT_HOST)
+    port = gitlab_conf.get('webhook_port', DEFAULT_PORT)
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logging.info(f'Приём webhook GitLab на {host}:{port}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
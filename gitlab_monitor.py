@@ -13,6 +13,7 @@
       url           - URL GitLab (например, "https://gitlab.com")
       token         - персональный токен для доступа к API GitLab
       poll_interval - интервал опроса (в секундах)
+      concurrency   - максимальное число одновременных запросов к API
 
 При каждом опросе список проектов получается через API.
 Для каждого проекта извлекается его идентификатор и название (project_name).
@@ -20,20 +21,23 @@
 """
 
 import asyncio
+import functools
 import logging
 import sys
 
 import aiohttp
 import tomllib
 
-from gitlab import api
+from gitlab import api, http_client
 
 CONFIG_FILE = 'config.toml'
 
 
-async def load_config():
+@functools.cache
+def load_config():
     """
-    Загружает конфигурацию из TOML файла.
+    Загружает конфигурацию из TOML файла. Файл читается один раз, для
+    повторного чтения нужно вызвать load_config.cache_clear().
 
     :return: Словарь с параметрами конфигурации.
     """
@@ -55,7 +59,7 @@ async def monitor():
     Для каждого проекта определяется статус последнего пайплайна.
     Если статус изменился с предыдущего опроса, отправляется уведомление, включающее название проекта.
     """
-    config = await load_config()
+    config = load_config()
     gitlab_conf = config.get('gitlab', {})
     base_url = gitlab_conf.get('url', 'https://gitlab.com')
     token = gitlab_conf.get('token', '')
@@ -65,48 +69,54 @@ async def monitor():
         print('Токен GitLab не задан в конфигурации.', file=sys.stderr)
         sys.exit(1)
 
+    http_client.set_concurrency_limit(
+        gitlab_conf.get('concurrency', http_client.DEFAULT_CONCURRENCY)
+    )
     previous_status = {}
 
-    while True:
-        await asyncio.sleep(poll_interval)
-        projects = await api.fetch_all_projects(base_url, token)
-        if projects is None:
+    try:
+        while True:
             await asyncio.sleep(poll_interval)
-            continue
-
-        for project in projects:
-            project_id = project.get('id')
-            project_name = project.get('name', f'Проект {project_id}')
-            pipeline = await api.fetch_pipeline(project_id, base_url, token)
-            if pipeline is None:
+            projects = await api.fetch_all_projects(base_url, token)
+            if projects is None:
+                await asyncio.sleep(poll_interval)
                 continue
-            pipeline_id = pipeline.get('id')
-            status = pipeline.get('status')
-            prev = previous_status.get(project_id)
-            if prev is None:
-                previous_status[project_id] = {
-                    'id': pipeline_id,
-                    'status': status,
-                    'name': project_name,
-                }
-            elif prev['id'] != pipeline_id or prev['status'] != status:
-                previous_status[project_id] = {
-                    'id': pipeline_id,
-                    'status': status,
-                    'name': project_name,
-                }
-                title = f'Пайплайн проекта {project_name}'
-                if status == 'success':
-                    message = (
-                        f'Пайплайн проекта {project_name} завершён успешно.'
-                    )
-                elif status == 'failed':
-                    message = (
-                        f'Пайплайн проекта {project_name} завершился с ошибкой.'
-                    )
-                else:
-                    message = f'Новый статус пайплайна проекта {project_name}: {status}'
-                logging.info(f'{title}: {message}')
+
+            for project in projects:
+                project_id = project.get('id')
+                project_name = project.get('name') or f'Проект {project_id}'
+                pipeline = await api.fetch_pipeline(project_id, base_url, token)
+                if pipeline is None:
+                    continue
+                pipeline_id = pipeline.get('id')
+                status = pipeline.get('status')
+                prev = previous_status.get(project_id)
+                if prev is None:
+                    previous_status[project_id] = {
+                        'id': pipeline_id,
+                        'status': status,
+                        'name': project_name,
+                    }
+                elif prev['id'] != pipeline_id or prev['status'] != status:
+                    previous_status[project_id] = {
+                        'id': pipeline_id,
+                        'status': status,
+                        'name': project_name,
+                    }
+                    title = f'Пайплайн проекта {project_name}'
+                    if status == 'success':
+                        message = (
+                            f'Пайплайн проекта {project_name} завершён успешно.'
+                        )
+                    elif status == 'failed':
+                        message = (
+                            f'Пайплайн проекта {project_name} завершился с ошибкой.'
+                        )
+                    else:
+                        message = f'Новый статус пайплайна проекта {project_name}: {status}'
+                    logging.info(f'{title}: {message}')
+    finally:
+        await api.shutdown()
 
 
 def main():
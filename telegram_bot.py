@@ -3,7 +3,8 @@
 Telegram-бот для мониторинга событий GitLab.
 ============================================
 
-Этот скрипт использует функции из пакета gitlab для опроса событий:
+Этот скрипт использует функции из пакета gitlab для опроса событий (или их приёма
+через webhook GitLab, если задан gitlab.mode = "webhook"):
   - CI/CD пайплайнов,
   - push-событий,
   - merge request.
@@ -19,27 +20,331 @@ repo_mapping, уведомление будет дополнительно со
     * push_template для push-событий,
     * mr_template для Merge Request.
   Также используется repo_mapping для привязки проекта к тегу.
+  Уведомления одного типа по одному проекту, пришедшие в течение
+  batch_window_ms миллисекунд, объединяются в одно сообщение.
+  При dedup_pipeline_transitions = true повторные уведомления о статусе
+  пайплайна не отправляются.
 """
 
 import asyncio
+import functools
 import logging
+import string
 import sys
-from typing import Any
+from collections import OrderedDict, defaultdict
+from collections.abc import AsyncIterator, Coroutine
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, Callable
 
 import tomllib
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    LinkPreviewOptions,
+)
 
-from gitlab import events
+from gitlab import api, events, http_client, webhook
 from gitlab.api import GitlabConfig
 
 CONFIG_FILE: str = 'config.toml'
 
+# Ограничения Telegram: 30 сообщений в секунду всего и 20 в минуту на чат.
+GLOBAL_RATE: int = 30
+CHAT_RATE: int = 20
+CHAT_PERIOD: float = 60
+SEND_ATTEMPTS: int = 3
+# Окно объединения уведомлений и максимальная длина сообщения Telegram.
+BATCH_WINDOW_MS: int = 500
+BATCH_SEPARATOR: str = '\n——\n'
+MESSAGE_LIMIT: int = 4096
+# Очередь отправки и число обработчиков, отправляющих из неё сообщения.
+SEND_QUEUE_SIZE: int = 10_000
+SENDER_WORKERS: int = 4
+# Текст кнопки со ссылкой на проект или merge request в GitLab.
+LINK_TEXT: str = 'Открыть в GitLab'
+# Признаки ошибки Bot API, вызванной кнопкой (например, BUTTON_URL_INVALID).
+BUTTON_ERROR_MARKERS: tuple[str, ...] = ('BUTTON', 'URL')
 
-async def load_config() -> dict[str, Any]:
+# Сколько пайплайнов помнит PipelineDedup.
+DEDUP_CACHE_SIZE: int = 10_000
+# Сколько ждать отправки очереди уведомлений при остановке, в секундах.
+SHUTDOWN_TIMEOUT: float = 5
+
+_NO_PREVIEW = LinkPreviewOptions(is_disabled=True)
+_background_tasks: set[asyncio.Task[Any]] = set()
+
+
+class _TokenBucket:
+    """
+    Ведро токенов: capacity токенов, равномерно восполняемых за period секунд.
+    """
+
+    def __init__(self, capacity: int, period: float) -> None:
+        self._capacity = capacity
+        self._rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> None:
+        """
+        Забирает один токен, при необходимости ожидая его восполнения.
+        """
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated) * self._rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class TelegramLimiter:
+    """
+    Ограничитель частоты отправки сообщений в Telegram.
+
+    Держит общее ведро токенов на бота и отдельное ведро на каждый чат.
+    Сообщения в один чат отправляются строго по очереди: блокировка чата
+    удерживается на время ожидания токенов и самой отправки, а ожидающие
+    asyncio.Lock обслуживаются в порядке FIFO.
+
+    Отдельного предела одновременных запросов к Bot API нет: все
+    уведомления уходят в один чат, блокировка которого и так допускает
+    не больше одной отправки за раз, а при ответе 429 send_message ждёт
+    retry_after, не отпуская очередь чата.
+    """
+
+    def __init__(
+        self,
+        global_rate: int = GLOBAL_RATE,
+        chat_rate: int = CHAT_RATE,
+        chat_period: float = CHAT_PERIOD,
+    ) -> None:
+        self._global = _TokenBucket(global_rate, 1)
+        self._chats: defaultdict[Any, _TokenBucket] = defaultdict(
+            lambda: _TokenBucket(chat_rate, chat_period)
+        )
+        self._chat_locks: defaultdict[Any, asyncio.Lock] = defaultdict(
+            asyncio.Lock
+        )
+
+    @asynccontextmanager
+    async def acquire(self, chat_id: Any) -> AsyncIterator[None]:
+        """
+        Дожидается разрешения на отправку сообщения в чат.
+
+        :param chat_id: Идентификатор чата.
+        """
+        async with self._chat_locks[chat_id]:
+            await self._chats[chat_id].take()
+            await self._global.take()
+            yield
+
+
+async def send_message(
+    bot: Bot,
+    limiter: TelegramLimiter,
+    chat_id: Any,
+    text: str,
+    **kwargs: Any,
+) -> None:
+    """
+    Отправляет сообщение с учётом ограничений Telegram.
+
+    При ответе 429 (TelegramRetryAfter) ожидает указанное Telegram время,
+    не отпуская очередь чата, и повторяет отправку. Если Telegram отклонил
+    сообщение из-за кнопки (например, BUTTON_URL_INVALID для адреса вида
+    http://localhost), сообщение отправляется повторно без кнопки; другие
+    ошибки 400 передаются вызывающему коду.
+
+    :param bot: Экземпляр Telegram-бота.
+    :param limiter: Ограничитель частоты отправки.
+    :param chat_id: Идентификатор чата.
+    :param text: Текст сообщения.
+    :param kwargs: Дополнительные параметры bot.send_message.
     """
-    Загружает конфигурацию из TOML файла.
+    async with limiter.acquire(chat_id):
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            try:
+                await bot.send_message(chat_id, text, **kwargs)
+                return
+            except TelegramRetryAfter as e:
+                if attempt == SEND_ATTEMPTS:
+                    raise
+                logging.warning(
+                    'Telegram ограничил частоту отправки, повтор через %s с.',
+                    e.retry_after,
+                )
+                await asyncio.sleep(e.retry_after)
+            except TelegramBadRequest as e:
+                if (
+                    kwargs.get('reply_markup') is None
+                    or attempt == SEND_ATTEMPTS
+                    or not any(
+                        marker in e.message.upper()
+                        for marker in BUTTON_ERROR_MARKERS
+                    )
+                ):
+                    raise
+                logging.warning(
+                    'Telegram отклонил кнопку сообщения (%s), повтор без неё.',
+                    e.message,
+                )
+                kwargs = {**kwargs, 'reply_markup': None}
+
+
+Outgoing = tuple[Any, str, dict[str, Any]]
+
+
+def enqueue(queue: asyncio.Queue[Outgoing], item: Outgoing) -> None:
+    """
+    Помещает сообщение в очередь отправки, не ожидая. Если очередь заполнена,
+    самое старое сообщение отбрасывается.
+
+    :param queue: Очередь отправки.
+    :param item: Тройка (идентификатор чата, текст, параметры send_message).
+    """
+    while True:
+        try:
+            queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.task_done()
+            logging.warning(
+                'Очередь отправки в Telegram переполнена, '
+                'самое старое сообщение отброшено.'
+            )
+
+
+async def sender(
+    queue: asyncio.Queue[Outgoing],
+    bot: Bot,
+    limiter: TelegramLimiter,
+) -> None:
+    """
+    Обработчик очереди отправки: забирает сообщения и отправляет их через
+    send_message, пока не будет отменён. Ошибки отправки логируются.
+
+    :param queue: Очередь отправки.
+    :param bot: Экземпляр Telegram-бота.
+    :param limiter: Ограничитель частоты отправки.
+    """
+    while True:
+        chat_id, text, kwargs = await queue.get()
+        try:
+            await send_message(bot, limiter, chat_id, text, **kwargs)
+        except Exception as e:
+            logging.error(
+                'Ошибка отправки уведомления в Telegram: %s',
+                e,
+                exc_info=True,
+            )
+        finally:
+            queue.task_done()
+
+
+class NotificationBatcher:
+    """
+    Объединяет уведомления и передаёт их в очередь отправки.
+
+    Уведомления одного типа по одному проекту, поступившие в чат в течение
+    окна window_ms миллисекунд, отправляются одним сообщением, части которого
+    разделены BATCH_SEPARATOR. Слишком длинный текст разбивается на несколько
+    сообщений по границам уведомлений. Окно отсчитывается от первого
+    уведомления; если за окно пришло одно уведомление, оно отправляется как
+    есть. При window_ms = 0 уведомления передаются в очередь сразу.
+    flush_all передаёт в очередь все накопленные пакеты, не дожидаясь окна.
+    """
+
+    def __init__(
+        self,
+        queue: asyncio.Queue[Outgoing],
+        window_ms: float = BATCH_WINDOW_MS,
+    ) -> None:
+        self._queue = queue
+        self._window = window_ms / 1000
+        self._pending: dict[
+            tuple[Any, ...],
+            tuple[Any, list[str], dict[str, Any]],
+        ] = {}
+        self._timers: dict[tuple[Any, ...], asyncio.TimerHandle] = {}
+
+    def add(
+        self,
+        key: tuple[Any, ...],
+        chat_id: Any,
+        text: str,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Добавляет уведомление в пакет с ключом key.
+
+        :param key: Ключ пакета; уведомления в разные чаты должны иметь
+            разные ключи.
+        :param chat_id: Идентификатор чата.
+        :param text: Текст уведомления.
+        :param kwargs: Дополнительные параметры bot.send_message.
+        """
+        if self._window <= 0:
+            enqueue(self._queue, (chat_id, text, kwargs))
+            return
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending[1].append(text)
+            return
+        self._pending[key] = (chat_id, [text], kwargs)
+        self._timers[key] = asyncio.get_running_loop().call_later(
+            self._window,
+            self._flush,
+            key,
+        )
+
+    def _flush(self, key: tuple[Any, ...]) -> None:
+        """
+        Передаёт накопленный пакет в очередь, объединяя уведомления в
+        сообщения не длиннее MESSAGE_LIMIT символов.
+
+        :param key: Ключ пакета.
+        """
+        self._timers.pop(key, None)
+        chat_id, parts, kwargs = self._pending.pop(key)
+        chunk = parts[0]
+        for part in parts[1:]:
+            if len(chunk) + len(BATCH_SEPARATOR) + len(part) > MESSAGE_LIMIT:
+                enqueue(self._queue, (chat_id, chunk, kwargs))
+                chunk = part
+            else:
+                chunk += BATCH_SEPARATOR + part
+        enqueue(self._queue, (chat_id, chunk, kwargs))
+
+    def flush_all(self) -> None:
+        """
+        Отменяет таймеры окон и передаёт в очередь все накопленные пакеты.
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        for key in list(self._pending):
+            self._flush(key)
+
+
+@functools.cache
+def load_config() -> dict[str, Any]:
+    """
+    Загружает конфигурацию из TOML файла. Файл читается один раз, для
+    повторного чтения нужно вызвать load_config.cache_clear().
 
     :return: Словарь с настройками.
     """
@@ -47,15 +352,261 @@ async def load_config() -> dict[str, Any]:
         with open(CONFIG_FILE, 'rb') as f:
             return tomllib.load(f)
     except Exception as e:
-        logging.error(f'Ошибка загрузки конфигурации: {e}')
+        logging.error('Ошибка загрузки конфигурации: %s', e, exc_info=True)
         sys.exit(1)
 
 
+_DEFAULT_PIPELINE_TPL: str = (
+    '<b>CI/CD обновление: {project_name}</b>\n'
+    'Пользователь: GitLab\n'
+    'Время: {timestamp}\n'
+    '{description}'
+)
+_DEFAULT_PUSH_TPL: str = (
+    '<b>Push событие: {project_name}</b>\n'
+    'Пользователь: {author}\n'
+    'Время: {timestamp}\n'
+    'Действие: Push в ветку {branch}, коммитов: {commit_count}'
+)
+_DEFAULT_MR_TPL: str = (
+    '<b>Merge Request: {project_name}</b>\n'
+    'Пользователь: {author}\n'
+    'Время: {timestamp}\n'
+    'Действие: {title} (состояние: {state})'
+)
+_DEFAULT_MSG_TPL: str = '<b>GitLab событие</b>\nДанные: {event}'
+
+
+Renderer = Callable[[dict[str, Any]], str]
+
+
+def compile_template(template: str) -> Renderer:
+    """
+    Разбирает шаблон один раз и возвращает функцию его заполнения.
+
+    Результат функции совпадает с template.format(**data), но шаблон не
+    разбирается заново при каждом вызове. Для шаблонов со сложными полями
+    (атрибуты, индексы, вложенные поля в спецификации формата) возвращается
+    template.format_map.
+
+    :param template: Шаблон в синтаксисе str.format.
+    :return: Функция, принимающая словарь значений и возвращающая текст.
+    :raises ValueError: Если шаблон некорректен.
+    """
+    formatter = string.Formatter()
+    parts = tuple(formatter.parse(template))
+    for _, field, spec, _ in parts:
+        if field is not None and (not field.isidentifier() or '{' in spec):
+            return template.format_map
+
+    def render(data: dict[str, Any]) -> str:
+        chunks: list[str] = []
+        for literal, field, spec, conversion in parts:
+            chunks.append(literal)
+            if field is not None:
+                value = data[field]
+                if conversion:
+                    value = formatter.convert_field(value, conversion)
+                chunks.append(format(value, spec))
+        return ''.join(chunks)
+
+    return render
+
+
+def load_templates(telegram_conf: dict[str, Any]) -> dict[str, Renderer]:
+    """
+    Собирает шаблоны уведомлений из конфигурации, подставляя шаблоны по
+    умолчанию для незаданных, и компилирует их через compile_template.
+    Вызывается один раз при запуске. Некорректный шаблон из конфигурации
+    заменяется шаблоном по умолчанию.
+
+    :param telegram_conf: Секция конфигурации [telegram] из config.toml.
+    :return: Словарь {ключ шаблона: функция заполнения шаблона}.
+    """
+    renderers: dict[str, Renderer] = {}
+    for key, option, default in (
+        ('pipeline', 'pipeline_template', _DEFAULT_PIPELINE_TPL),
+        ('push', 'push_template', _DEFAULT_PUSH_TPL),
+        ('merge_request', 'mr_template', _DEFAULT_MR_TPL),
+        ('message', 'message_template', _DEFAULT_MSG_TPL),
+    ):
+        template = telegram_conf.get(option) or default
+        try:
+            renderers[key] = compile_template(template)
+        except ValueError as e:
+            logging.error('Некорректный шаблон %s: %s', option, e)
+            renderers[key] = compile_template(default)
+    return renderers
+
+
+def _build_pipeline_data(
+    event: Any,
+    project_id: Any,
+    project_name: str,
+    base_url: str,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Собирает данные шаблона для события пайплайна.
+
+    :param event: Словарь с данными события.
+    :param project_id: Идентификатор проекта.
+    :param project_name: Название проекта.
+    :param base_url: Базовый URL GitLab.
+    :return: Пара (ключ шаблона, данные для подстановки).
+    """
+    status = event.get('status', '')
+    description = f'Новый статус: {status}'
+    if status == 'success':
+        description = 'Пайплайн завершён успешно.'
+    elif status == 'failed':
+        description = 'Пайплайн завершился с ошибкой.'
+    return 'pipeline', {
+        'project_id': project_id,
+        'project_name': project_name,
+        'timestamp': event.get('timestamp'),
+        'description': description,
+        'base_url': base_url,
+        'url': f'{base_url}/projects/{project_id}',
+    }
+
+
+def _build_push_data(
+    event: Any,
+    project_id: Any,
+    project_name: str,
+    base_url: str,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Собирает данные шаблона для push-события.
+
+    :param event: Словарь с данными события.
+    :param project_id: Идентификатор проекта.
+    :param project_name: Название проекта.
+    :param base_url: Базовый URL GitLab.
+    :return: Пара (ключ шаблона, данные для подстановки).
+    """
+    return 'push', {
+        'project_id': project_id,
+        'project_name': project_name,
+        'branch': event.get('branch', ''),
+        'commit_count': event.get('commit_count', 0),
+        'timestamp': event.get('timestamp'),
+        'author': event.get('author', 'GitLab'),
+        'base_url': base_url,
+        'url': f'{base_url}/projects/{project_id}',
+    }
+
+
+def _build_mr_data(
+    event: Any,
+    project_id: Any,
+    project_name: str,
+    base_url: str,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Собирает данные шаблона для события merge request.
+
+    :param event: Словарь с данными события.
+    :param project_id: Идентификатор проекта.
+    :param project_name: Название проекта.
+    :param base_url: Базовый URL GitLab.
+    :return: Пара (ключ шаблона, данные для подстановки).
+    """
+    return 'merge_request', {
+        'project_id': project_id,
+        'project_name': project_name,
+        'state': event.get('state', ''),
+        'title': event.get('title', 'Merge Request'),
+        'timestamp': event.get('timestamp'),
+        'base_url': base_url,
+        'iid': event.get('iid'),
+        'author': event.get('author', 'GitLab'),
+        'url': f'{base_url}/projects/{project_id}/merge_requests/'
+        f'{event.get("iid")}',
+    }
+
+
+def load_pings(telegram_conf: dict[str, Any]) -> dict[str, str]:
+    """
+    Строит обратный индекс repo_mapping: для каждого проекта - строку с тегами
+    всех упоминаний, к которым он привязан. Вызывается один раз при запуске.
+
+    :param telegram_conf: Секция конфигурации [telegram] из config.toml.
+    :return: Словарь {название проекта: строка пинга}.
+    """
+    repo_mapping: dict[str, Any] = telegram_conf.get('repo_mapping', {})
+    project_to_pings: dict[str, str] = {}
+    for mention, projects in repo_mapping.items():
+        for project in projects:
+            project_to_pings[project] = (
+                project_to_pings.get(project, '') + f'{mention} '
+            )
+    return project_to_pings
+
+
+# Построители данных шаблона по типу события: возвращают ключ шаблона и
+# словарь значений для подстановки.
+HANDLERS: dict[
+    str,
+    Callable[[Any, Any, str, str], tuple[str, dict[str, Any]]],
+] = {
+    'pipeline': _build_pipeline_data,
+    'push': _build_push_data,
+    'merge_request': _build_mr_data,
+}
+
+
+class PipelineDedup:
+    """
+    Подавляет повторные уведомления о статусе пайплайна.
+
+    Хранит последний отправленный статус для size последних пайплайнов
+    (самые давние вытесняются). Уведомление пропускается, если статус не
+    изменился, а также если после успешного завершения пайплайн перешёл в
+    любой статус, кроме failed.
+    """
+
+    def __init__(self, size: int = DEDUP_CACHE_SIZE) -> None:
+        self._size = size
+        self._sent: OrderedDict[int, str] = OrderedDict()
+
+    def should_send(self, pipeline_id: int, status: str) -> bool:
+        """
+        Проверяет, нужно ли отправлять уведомление, и запоминает статус.
+
+        :param pipeline_id: Идентификатор пайплайна.
+        :param status: Новый статус пайплайна.
+        :return: True, если уведомление нужно отправить.
+        """
+        last = self._sent.get(pipeline_id)
+        if last == status or (last == 'success' and status != 'failed'):
+            return False
+        self._sent[pipeline_id] = status
+        self._sent.move_to_end(pipeline_id)
+        if len(self._sent) > self._size:
+            self._sent.popitem(last=False)
+        return True
+
+
+@dataclass(frozen=True, slots=True)
+class BotContext:
+    """
+    Неизменяемые параметры отправки уведомлений, собранные из конфигурации
+    один раз при запуске.
+    """
+
+    base_url: str
+    default_chat: Any
+    thread_id: int | None
+    templates: dict[str, Renderer]
+    project_to_pings: dict[str, str]
+    batcher: NotificationBatcher
+    pipeline_dedup: PipelineDedup | None = None
+
+
 async def telegram_notification_callback(
     event: events.Event,
-    bot: Bot,
-    telegram_conf: dict[str, Any],
-    gitlab_conf: GitlabConfig,
+    ctx: BotContext,
 ) -> None:
     """
     Callback для отправки уведомлений в Telegram. Формирует уведомление,
@@ -63,138 +614,105 @@ async def telegram_notification_callback(
     проекта задан соответствующий тег в repo_mapping.
 
     :param event: Словарь с данными события.
-    :param bot: Экземпляр Telegram-бота.
-    :param telegram_conf: Секция конфигурации [telegram] из config.toml.
-    :param gitlab_conf: Секция конфигурации [gitlab] из config.toml.
+    :param ctx: Параметры отправки уведомлений.
     """
-    base_url = gitlab_conf['url']
+    if (
+        ctx.pipeline_dedup is not None
+        and event['type'] == 'pipeline'
+        and not ctx.pipeline_dedup.should_send(
+            event['pipeline_id'],
+            event['status'],
+        )
+    ):
+        return
+
     project_id: Any = event.get('project_id')
-    project_name: str = event.get('project_name', f'Проект {project_id}')
-    repo_mapping: dict[str, Any] = telegram_conf.get('repo_mapping', {})
-    ping = ''
-    for mention, projects in repo_mapping.items():
-        if project_name in projects:
-            ping += f'{mention} '
-
-    event_type = event['type']
-    if event_type == 'pipeline':
-        status = event.get('status', '')
-        description = f'Новый статус: {status}'
-        if status == 'success':
-            description = 'Пайплайн завершён успешно.'
-        elif status == 'failed':
-            description = 'Пайплайн завершился с ошибкой.'
-        template = telegram_conf.get('pipeline_template')
-        if not template:
-            template = (
-                '<b>CI/CD обновление: {project_name}</b>\n'
-                'Пользователь: GitLab\n'
-                'Время: {timestamp}\n'
-                '{description}\n'
-                'Ссылка: <a href="{base_url}/projects/{project_id}">{project_name}</a>'
-            )
-        data = {
-            'project_id': project_id,
-            'project_name': project_name,
-            'timestamp': event.get('timestamp'),
-            'description': description,
-            'base_url': base_url,
-        }
-    elif event_type == 'push':
-        branch = event.get('branch', '')
-        commit_count = event.get('commit_count', 0)
-        author = event.get('author', 'GitLab')
-        template = telegram_conf.get('push_template')
-        if not template:
-            template = (
-                '<b>Push событие: {project_name}</b>\n'
-                'Пользователь: {author}\n'
-                'Время: {timestamp}\n'
-                'Действие: Push в ветку {branch}, коммитов: {commit_count}\n'
-                'Ссылка: <a href="{base_url}/projects/{project_id}">{project_name}</a>'
-            )
-        data = {
-            'project_id': project_id,
-            'project_name': project_name,
-            'branch': branch,
-            'commit_count': commit_count,
-            'timestamp': event.get('timestamp'),
-            'author': author,
-            'base_url': base_url,
-        }
-    elif event_type == 'merge_request':
-        state = event.get('state', '')
-        title_mr = event.get('title', 'Merge Request')
-        iid = event.get('iid')
-        author = event.get('author', 'GitLab')
-        template = telegram_conf.get('mr_template')
-        if not template:
-            template = (
-                '<b>Merge Request: {project_name}</b>\n'
-                'Пользователь: {author}\n'
-                'Время: {timestamp}\n'
-                'Действие: {title} (состояние: {state})\n'
-                'Ссылка: <a href="{base_url}/projects/{project_id}/merge_requests/{iid}">MR #{iid}</a>'
-            )
-        data = {
-            'project_id': project_id,
-            'project_name': project_name,
-            'state': state,
-            'title': title_mr,
-            'timestamp': event.get('timestamp'),
-            'base_url': base_url,
-            'iid': iid,
-            'author': author,
-        }
+    project_name: str = event.get('project_name') or f'Проект {project_id}'
+
+    build = HANDLERS.get(event['type'])
+    if build is not None:
+        template_key, data = build(event, project_id, project_name, ctx.base_url)
     else:
-        template = telegram_conf.get('message_template')
-        if not template:
-            template = '<b>GitLab событие</b>\nДанные: {event}'
-        data = {'event': event}
+        template_key, data = 'message', {'event': event}
+    render = ctx.templates[template_key]
 
-    data['ping'] = ping
+    data['ping'] = ctx.project_to_pings.get(project_name, '')
     try:
-        text: str = template.format(**data)
+        text: str = render(data)
     except KeyError as e:
         text = f'Ошибка формирования сообщения: отсутствует ключ {e}'
-    try:
-        await bot.send_message(
-            telegram_conf.get('default_chat', ''),
-            text,
-            parse_mode=ParseMode.HTML,
-            message_thread_id=telegram_conf.get('message_thread_id'),
+    url: str | None = data.get('url')
+    reply_markup = None
+    if url:
+        reply_markup = InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text=LINK_TEXT, url=url)]]
         )
-    except Exception as e:
-        logging.error(f'Ошибка отправки уведомления в Telegram: {e}')
+    # Push из одного коммита - малозначимое событие, отправляется без звука.
+    silent = event['type'] == 'push' and event.get('commit_count') == 1
 
+    ctx.batcher.add(
+        # Объединяются только уведомления с одинаковой кнопкой и звуком.
+        (ctx.default_chat, project_id, event['type'], url, silent),
+        ctx.default_chat,
+        text,
+        parse_mode=ParseMode.HTML,
+        message_thread_id=ctx.thread_id,
+        reply_markup=reply_markup,
+        link_preview_options=_NO_PREVIEW,
+        disable_notification=silent,
+    )
 
-async def start_polling(
-    bot: Bot,
-    telegram_conf: dict[str, Any],
-    gitlab_conf: GitlabConfig,
-) -> None:
+
+async def start_polling(ctx: BotContext, gitlab_conf: GitlabConfig) -> None:
     """
-    Запускает фоновые задачи для опроса событий GitLab и отправки уведомлений в Telegram.
+    Запускает получение событий GitLab и отправку уведомлений в Telegram.
+    В режиме gitlab.mode = "webhook" события принимаются HTTP сервером,
+    иначе (по умолчанию, "poll") GitLab API периодически опрашивается.
     """
+    callback = functools.partial(telegram_notification_callback, ctx=ctx)
+    if gitlab_conf.get('mode', 'poll') == 'webhook':
+        await webhook.serve(callback, gitlab_conf)
+    else:
+        await events.poll_all(callback, gitlab_conf)
 
-    async def callback(event: events.Event) -> None:
-        await telegram_notification_callback(
-            event,
-            bot,
-            telegram_conf,
-            gitlab_conf,
+
+def _log_exception(task: asyncio.Task[Any]) -> None:
+    """
+    Логирует исключение, которым завершилась фоновая задача.
+
+    :param task: Завершившаяся задача.
+    """
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logging.error(
+            'Фоновая задача %s завершилась с ошибкой: %s',
+            task.get_name(),
+            exc,
+            exc_info=exc,
         )
 
-    await asyncio.gather(
-        events.poll_pipeline_events(callback, gitlab_conf),
-        events.poll_push_events(callback, gitlab_conf),
-        events.poll_mr_events(callback, gitlab_conf),
-    )
+
+def _start_task(coro: Coroutine[Any, Any, Any], name: str) -> asyncio.Task[Any]:
+    """
+    Запускает фоновую задачу, сохраняя ссылку на неё до завершения и
+    логируя исключение, если задача упадёт.
+
+    :param coro: Корутина задачи.
+    :param name: Имя задачи.
+    :return: Запущенная задача.
+    """
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_log_exception)
+    return task
 
 
 async def main() -> None:
     logging.basicConfig(level=logging.INFO)
-    config: dict[str, Any] = await load_config()
+    config: dict[str, Any] = load_config()
     telegram_conf: dict[str, Any] = config.get('telegram', {})
     gitlab_conf: GitlabConfig = config.get('gitlab', {})
 
@@ -203,13 +721,64 @@ async def main() -> None:
         print('Токен Telegram не задан в конфигурации.', file=sys.stderr)
         sys.exit(1)
 
+    http_client.set_concurrency_limit(
+        gitlab_conf.get('concurrency', http_client.DEFAULT_CONCURRENCY)
+    )
+    # Одновременно к Bot API обращается не больше одного запроса на
+    # обработчик очереди, поэтому больший пул соединений не нужен.
+    session = AiohttpSession(limit=SENDER_WORKERS)
     bot: Bot = Bot(
         token=bot_token,
+        session=session,
         default_bot_properties=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    dp: Dispatcher = Dispatcher()
-    asyncio.create_task(start_polling(bot, telegram_conf, gitlab_conf))
-    await dp.start_polling(bot)
+    limiter = TelegramLimiter()
+    send_queue: asyncio.Queue[Outgoing] = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    senders = [
+        _start_task(sender(send_queue, bot, limiter), f'sender-{i}')
+        for i in range(SENDER_WORKERS)
+    ]
+    ctx = BotContext(
+        base_url=gitlab_conf.get('url', 'https://gitlab.com'),
+        default_chat=telegram_conf.get('default_chat', ''),
+        thread_id=telegram_conf.get('message_thread_id'),
+        templates=load_templates(telegram_conf),
+        project_to_pings=load_pings(telegram_conf),
+        batcher=NotificationBatcher(
+            send_queue,
+            telegram_conf.get('batch_window_ms', BATCH_WINDOW_MS),
+        ),
+        pipeline_dedup=(
+            PipelineDedup()
+            if telegram_conf.get('dedup_pipeline_transitions', False)
+            else None
+        ),
+    )
+    # Бот только отправляет уведомления и не получает обновления Telegram,
+    # поэтому процесс работает, пока работает получение событий GitLab.
+    # Исключение задачи опроса выходит из main, поэтому она запускается без
+    # _log_exception, чтобы ошибка не попала в лог дважды.
+    poll_task = asyncio.create_task(start_polling(ctx, gitlab_conf), name='poll')
+    try:
+        await poll_task
+    finally:
+        poll_task.cancel()
+        await asyncio.gather(poll_task, return_exceptions=True)
+        # Даём обработчикам отправить то, что уже стоит в очереди, вместе с
+        # пакетами, окно объединения которых ещё не истекло.
+        ctx.batcher.flush_all()
+        try:
+            await asyncio.wait_for(send_queue.join(), SHUTDOWN_TIMEOUT)
+        except TimeoutError:
+            logging.warning(
+                'Не отправлено уведомлений при остановке: %s',
+                send_queue.qsize(),
+            )
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+        await bot.session.close()
+        await api.shutdown()
 
 
 if __name__ == '__main__':